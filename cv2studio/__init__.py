@@ -3,42 +3,132 @@
     framework it becomes easier to decompose
     an image processing app into components.
 '''
+import threading
+
 import cv2
 from .gui import *
+from .profiling import MemoryProfiler
+from .context import FrameContext
+from .tiling import TiledProcessor, open_image
 
 # constants for path type
 WEBCAM = 0
 IMAGE = 1
 VIDEO = 2
 RESOURCE = 3
+TILED_IMAGE = 4
+
+# constants for image formats
+# components may declare
+BGR = 'BGR'
+GRAY = 'GRAY'
+
+
+def convert_format(img, image_format, context=None):
+    '''
+    Converts an image to the specified format.
+    The image is returned as is if it is already
+    in the required format.
+    :param img: image to convert
+    :param image_format: required format (BGR or GRAY)
+    :param context: frame context to take the conversion from
+    :return: converted image
+    '''
+    if context is not None and context.is_frame(img):
+        if image_format == GRAY:
+            return context.gray()
+        if image_format == BGR:
+            return context.bgr()
+    if image_format == GRAY and len(img.shape) == 3:
+        if img.shape[2] == 4:
+            return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if image_format == BGR and len(img.shape) == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if image_format == BGR and img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    return img
 
 
 class Component(object):
     '''
     Component is a part of image processing app.
+
+    A component may declare the format it expects
+    by setting <input_format> to BGR or GRAY. Then
+    the image is converted before processing instead
+    of retrying after failure.
+
+    The frame context of the current frame is
+    available in <frame_context> while processing.
+    Views it provides are shared between components
+    and must not be modified in place. If the frame
+    is modified in place, the component must return it
+    so that the views are invalidated.
     '''
 
-    def __call__(self, img):
+    # format of images accepted by
+    # the component (BGR, GRAY or None
+    # if it is not known in advance)
+    input_format = None
+
+    @property
+    def frame_context(self):
+        '''
+        Frame context of the frame being processed.
+        It is kept per thread, so the component can
+        process tiles in several threads at once.
+        '''
+        local = self.__dict__.get('_frame_context')
+        return getattr(local, 'context', None)
+
+    @frame_context.setter
+    def frame_context(self, context):
+        local = self.__dict__.get('_frame_context')
+        if local is None:
+            # setdefault is atomic, so threads
+            # calling it at once share one local
+            local = self.__dict__.setdefault('_frame_context', threading.local())
+        local.context = context
+
+    def __getstate__(self):
+        # contexts are not copied
+        # when the component is pickled
+        state = self.__dict__.copy()
+        state.pop('_frame_context', None)
+        return state
+
+    def __call__(self, img, context=None):
         """
         Additional proxy layer between
         application and component.
         :param img: image to process
+        :param context: frame context of the current frame
         :return: processed image
         """
+        self.frame_context = context
+
+        # declared format is
+        # established up-front
+        if self.input_format is not None:
+            result = self.process(convert_format(img, self.input_format, context))
 
         # auto layer tuning
         # Supported formats
         # - BGR
         # - GRAY
-        try:
-            result = self.process(img)
-        except Exception:
-            if len(img.shape) == 3:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            elif len(img.shape) == 2:
-                img = cv2.merge((img, img, img))
-            result = self.process(img)
-
+        else:
+            try:
+                result = self.process(img)
+            except Exception:
+                if len(img.shape) == 3:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                elif len(img.shape) == 2:
+                    img = cv2.merge((img, img, img))
+                result = self.process(img)
+
+        if context is not None:
+            context.release(result)
         return result
 
     def process(self, img):
@@ -55,11 +145,13 @@ class Component(object):
 # TODO: optional width and height for App
 # TODO: automatic resource type recognition
 class App(object):
-    def __init__(self, path: str = None, resource_type=WEBCAM, window_name='Window', resource=None):
+    def __init__(self, path: str = None, resource_type=WEBCAM, window_name='Window', resource=None,
+                 tiling=None):
         '''
-        :param path: path to resource (image or video)
-        :param resource_type: type of resource (WEBCAM, IMAGE, VIDEO)
+        :param path: path to resource (image, video or .npy file for TILED_IMAGE)
+        :param resource_type: type of resource (WEBCAM, IMAGE, VIDEO, TILED_IMAGE)
         :param window_name: name of the application's main window
+        :param tiling: keyword arguments of process_tiled for TILED_IMAGE
         '''
 
         # image to be shown
@@ -72,8 +164,11 @@ class App(object):
             self.res = cv2.VideoCapture(path)
         elif resource_type == IMAGE:
             self.res = cv2.imread(path)
+        elif resource_type == TILED_IMAGE:
+            self.res = open_image(path)
         elif resource_type == RESOURCE:
             self.res = resource
+        self.tiling = tiling or {}
 
         # verify resource
         if self.res is None:
@@ -95,6 +190,15 @@ class App(object):
         # track bars
         self.tracks_window = TrackWindow()
 
+        # memory instrumentation
+        # is disabled by default
+        self.memory_profiler = None
+        self.memory_window = None
+
+        # derived views of the
+        # current frame
+        self.frame_context = FrameContext()
+
     def add_component(self, component: Component):
         self.components.append(component)
 
@@ -105,6 +209,45 @@ class App(object):
             if isinstance(attr, TrackBar):
                 self.tracks_window.append_track_bar(attr)
 
+    def enable_memory_profiling(self, window_size=100, threshold=1 << 20, log_window=False):
+        '''
+        Enables recording of memory used by
+        each component on every frame.
+        :param window_size: number of frames to detect memory growth over
+        :param threshold: growth in bytes to flag a component as leaking
+        :param log_window: if True, the report is displayed in a LogWindow
+        :return: the memory profiler
+        '''
+        self.memory_profiler = MemoryProfiler(window_size, threshold)
+        self.memory_profiler.start()
+        if log_window:
+            self.memory_window = LogWindow('Memory')
+        return self.memory_profiler
+
+    def process_tiled(self, output_path=None, tile_size=1024, halo=16, workers=None, processes=False):
+        '''
+        Processes the image resource tile by tile
+        in parallel. The result is stitched into
+        a memory-mapped .npy file.
+        See TiledProcessor for the requirements
+        to components.
+        :param output_path: path to the output .npy file (by default a temporary
+            file removed when the result is garbage collected)
+        :param tile_size: size of a tile side
+        :param halo: overlap with neighbouring tiles
+        :param workers: number of workers (number of CPUs by default)
+        :param processes: if True, processes are used instead of threads
+        :return: memory-mapped result
+        '''
+        pre_process = post_process = None
+        if type(self).pre_process is not App.pre_process:
+            pre_process = self.pre_process
+        if type(self).post_process is not App.post_process:
+            post_process = self.post_process
+        processor = TiledProcessor(self.components, tile_size, halo, workers, processes,
+                                   pre_process, post_process)
+        return processor.run(self.res, output_path)
+
     def pre_process(self, img):
         '''
         This method is called before any components.
@@ -140,10 +283,28 @@ class App(object):
             img = self.res.copy()
             result = True
 
+        # the whole image is processed
+        # at once and only one time
+        elif self.resource_type == TILED_IMAGE:
+            self.img = self.process_tiled(**self.tiling)
+            return False
+
+        # the resource is over
+        if not result:
+            self.img = None
+            return result
+
         # Here is where image processing go
         img = self.pre_process(img)
-        for component in self.components:
-            img = component(img)
+        self.frame_context.advance(img)
+        if self.memory_profiler is None:
+            for component in self.components:
+                img = component(img, self.frame_context)
+        else:
+            self.memory_profiler.next_frame()
+            for idx, component in enumerate(self.components):
+                name = '{0}:{1}'.format(idx, type(component).__name__)
+                img = self.memory_profiler.profile(name, component, img, self.frame_context)
         img = self.post_process(img)
 
         self.img = img
@@ -156,6 +317,9 @@ class App(object):
             self.window.hide()
             self.tracks_window.hide()
         self.tracks_window.display()
+        if self.memory_window is not None:
+            self.memory_profiler.to_log_window(self.memory_window)
+            self.memory_window.display()
 
     def main_loop(self, **kwargs):
         '''
@@ -183,6 +347,8 @@ class App(object):
         # cleaning up
         if self.resource_type == VIDEO or self.resource_type == WEBCAM:
             self.res.release()
+        if self.memory_profiler is not None:
+            self.memory_profiler.stop()
 
         cv2.destroyAllWindows()
 
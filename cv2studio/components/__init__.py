@@ -0,0 +1,385 @@
+"""
+    This module contains built-in components
+    of the cv2studio framework.
+
+    The components keep their output buffers,
+    kernels and lookup tables between frames
+    so that per-frame allocations are avoided.
+    Note that the returned image is the internal
+    buffer of the component and it is overwritten
+    on the next frame. Copy it if it must be kept.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from cv2studio import Component, TrackBar, GRAY
+
+
+__all__ = [
+    'BufferedComponent',
+    'GaussianBlur',
+    'Threshold',
+    'ColorConversion',
+    'Morphology',
+    'Resize',
+    'GammaCorrection'
+]
+
+
+def _value(param):
+    """
+    Resolves a component parameter.
+    :param param: constant value or track bar
+    :return: current value of the parameter
+    """
+    if isinstance(param, TrackBar):
+        return param.get_value()
+    return param
+
+
+def _odd(ksize):
+    """
+    Rounds kernel size up to the
+    nearest positive odd number.
+    :param ksize: kernel size
+    :return: odd kernel size
+    """
+    return max(1, int(ksize)) | 1
+
+
+# number of channels of
+# color spaces in OpenCV codes
+_COLOR_CHANNELS = {
+    'GRAY': 1,
+    'BGR': 3,
+    'RGB': 3,
+    'BGRA': 4,
+    'RGBA': 4
+}
+
+
+def _code_channels():
+    """
+    Finds number of source and target channels
+    of OpenCV color conversion codes by their names.
+    Codes with unknown source color space are omitted.
+    :return: dictionary code -> (source channels, target channels)
+    """
+    table = {}
+    conflicts = set()
+    for name in dir(cv2):
+        parts = name[len('COLOR_'):].split('2')
+        if not name.startswith('COLOR_') or len(parts) != 2:
+            continue
+        source, target = parts
+        if source not in _COLOR_CHANNELS:
+            continue
+        code = getattr(cv2, name)
+        channels = (_COLOR_CHANNELS[source], _COLOR_CHANNELS.get(target))
+        if table.setdefault(code, channels) != channels:
+            conflicts.add(code)
+    for code in conflicts:
+        del table[code]
+    return table
+
+
+def _channels(img):
+    """
+    :param img: image
+    :return: number of channels of the image
+    """
+    return img.shape[2] if len(img.shape) == 3 else 1
+
+
+def _to_channels(img, channels):
+    """
+    Converts a GRAY, BGR or BGRA image
+    to the number of channels.
+    :param img: image to convert
+    :param channels: required number of channels (1, 3 or 4)
+    :return: converted image
+    """
+    codes = {
+        (1, 3): cv2.COLOR_GRAY2BGR,
+        (1, 4): cv2.COLOR_GRAY2BGRA,
+        (3, 1): cv2.COLOR_BGR2GRAY,
+        (3, 4): cv2.COLOR_BGR2BGRA,
+        (4, 1): cv2.COLOR_BGRA2GRAY,
+        (4, 3): cv2.COLOR_BGRA2BGR
+    }
+    code = codes.get((_channels(img), channels))
+    if code is None:
+        return img
+    return cv2.cvtColor(img, code)
+
+
+class BufferedComponent(Component):
+    """
+    Base class for components that write
+    their result into a preallocated buffer.
+    Every thread has its own buffer, so the
+    component can process tiles in parallel.
+    """
+
+    def __init__(self):
+        self._buffer = None
+
+    @property
+    def _buffer(self):
+        local = self.__dict__.get('_local')
+        return getattr(local, 'buffer', None)
+
+    @_buffer.setter
+    def _buffer(self, buffer):
+        local = self.__dict__.get('_local')
+        if local is None:
+            # created lazily, so subclasses
+            # may skip BufferedComponent.__init__
+            local = self.__dict__.setdefault('_local', threading.local())
+        local.buffer = buffer
+
+    def __getstate__(self):
+        # buffers are not copied
+        # when the component is pickled
+        state = Component.__getstate__(self)
+        state.pop('_local', None)
+        return state
+
+    def output_buffer(self, shape, dtype, img=None):
+        """
+        Returns the output buffer of the component.
+        It is allocated again only if shape or
+        type of the output has changed.
+        :param shape: shape of the output
+        :param dtype: type of the output
+        :param img: input image, it is never used as a buffer
+        :return: buffer for the output
+        """
+        buffer = self._buffer
+        if buffer is None or buffer.shape != tuple(shape) \
+                or buffer.dtype != dtype or buffer is img:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffer = buffer
+        return buffer
+
+
+class GaussianBlur(BufferedComponent):
+    """
+    Blurs an image with a Gaussian filter.
+    Kernel size is rounded up to an odd number.
+    """
+
+    def __init__(self, ksize=5, sigma=0):
+        """
+        :param ksize: kernel size (value or track bar)
+        :param sigma: standard deviation (value or track bar)
+        """
+        BufferedComponent.__init__(self)
+        self.ksize = ksize
+        self.sigma = sigma
+
+    def process(self, img):
+        ksize = _odd(_value(self.ksize))
+        dst = self.output_buffer(img.shape, img.dtype, img)
+        return cv2.GaussianBlur(img, (ksize, ksize), _value(self.sigma), dst=dst)
+
+
+class Threshold(BufferedComponent):
+    """
+    Applies a fixed-level threshold
+    to a grayscale image.
+    """
+
+    input_format = GRAY
+
+    def __init__(self, thresh=127, max_value=255, threshold_type=cv2.THRESH_BINARY):
+        """
+        :param thresh: threshold value (value or track bar)
+        :param max_value: value assigned to pixels above the threshold
+        :param threshold_type: OpenCV threshold type
+        """
+        BufferedComponent.__init__(self)
+        self.thresh = thresh
+        self.max_value = max_value
+        self.threshold_type = threshold_type
+
+    def process(self, img):
+        dst = self.output_buffer(img.shape, img.dtype, img)
+        _, dst = cv2.threshold(img, _value(self.thresh), _value(self.max_value),
+                               self.threshold_type, dst=dst)
+        return dst
+
+
+class ColorConversion(BufferedComponent):
+    """
+    Converts color space of an image.
+    Conversion is skipped if the image is
+    already in the target format. Otherwise the
+    image is brought to the number of channels
+    the code expects before conversion.
+    The frame is converted through the frame context.
+    """
+
+    # number of source and target
+    # channels of conversion codes
+    CHANNELS = _code_channels()
+
+    def __init__(self, code=cv2.COLOR_BGR2GRAY):
+        """
+        :param code: OpenCV color conversion code
+        """
+        BufferedComponent.__init__(self)
+        self.code = code
+
+    def process(self, img):
+        channels = _channels(img)
+        source_channels, target_channels = self.CHANNELS.get(self.code, (None, None))
+        if source_channels is not None and source_channels != channels:
+            if target_channels == channels:
+                return img
+            img = _to_channels(img, source_channels)
+
+        # conversion of the frame is shared
+        # with other components through the
+        # context, it is never used as a buffer
+        context = self.frame_context
+        if context is not None and context.is_frame(img):
+            return context.cvt_color(self.code)
+
+        # number of output channels depends on the
+        # code, so the previous output is reused only
+        # if OpenCV accepts it as the destination
+        dst = self._buffer
+        if dst is not None and (dst is img or dst.shape[:2] != img.shape[:2]
+                                or dst.dtype != img.dtype):
+            dst = None
+        self._buffer = cv2.cvtColor(img, self.code, dst=dst)
+        return self._buffer
+
+
+class Morphology(BufferedComponent):
+    """
+    Applies a morphological operation.
+    The structuring element is rebuilt only
+    when its shape or size has changed.
+    """
+
+    def __init__(self, op=cv2.MORPH_OPEN, ksize=3, shape=cv2.MORPH_RECT, iterations=1):
+        """
+        :param op: OpenCV morphological operation
+        :param ksize: size of the structuring element (value or track bar)
+        :param shape: shape of the structuring element
+        :param iterations: number of times the operation is applied
+        """
+        BufferedComponent.__init__(self)
+        self.op = op
+        self.ksize = ksize
+        self.shape = shape
+        self.iterations = iterations
+        self._kernel_key = None
+        self._kernel = None
+
+    def kernel(self):
+        """
+        Returns the cached structuring element.
+        :return: structuring element
+        """
+        key = (self.shape, max(1, int(_value(self.ksize))))
+        if key != self._kernel_key:
+            self._kernel = cv2.getStructuringElement(key[0], (key[1], key[1]))
+            self._kernel_key = key
+        return self._kernel
+
+    def process(self, img):
+        dst = self.output_buffer(img.shape, img.dtype, img)
+        return cv2.morphologyEx(img, self.op, self.kernel(), dst=dst,
+                                iterations=_value(self.iterations))
+
+
+class Resize(BufferedComponent):
+    """
+    Resizes an image. Either the size or the
+    scale factor must be specified. If only width
+    or height is given the aspect ratio is kept.
+    The frame is resized through the frame context.
+    """
+
+    def __init__(self, width=None, height=None, scale=None, interpolation=cv2.INTER_LINEAR):
+        """
+        :param width: width of the output
+        :param height: height of the output
+        :param scale: scale factor used if size is not specified
+        :param interpolation: OpenCV interpolation method
+        """
+        if width is None and height is None and scale is None:
+            raise AttributeError('width, height or scale must be specified')
+        BufferedComponent.__init__(self)
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.interpolation = interpolation
+
+    def output_size(self, img):
+        """
+        Calculates size of the output image.
+        :param img: image to resize
+        :return: (width, height) of the output
+        """
+        h, w = img.shape[:2]
+        width = _value(self.width)
+        height = _value(self.height)
+        if width is None and height is None:
+            scale = _value(self.scale)
+            return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        if width is None:
+            width = max(1, int(round(w * height / h)))
+        if height is None:
+            height = max(1, int(round(h * width / w)))
+        return int(width), int(height)
+
+    def process(self, img):
+        width, height = self.output_size(img)
+        if (height, width) == img.shape[:2]:
+            return img
+        context = self.frame_context
+        if context is not None and context.is_frame(img):
+            return context.resized(width, height, self.interpolation)
+        dst = self.output_buffer((height, width) + img.shape[2:], img.dtype, img)
+        return cv2.resize(img, (width, height), dst=dst, interpolation=self.interpolation)
+
+
+class GammaCorrection(BufferedComponent):
+    """
+    Applies gamma correction to an 8-bit image.
+    The lookup table is rebuilt only when
+    gamma has changed.
+    """
+
+    def __init__(self, gamma=1.0):
+        """
+        :param gamma: gamma value (value or track bar)
+        """
+        BufferedComponent.__init__(self)
+        self.gamma = gamma
+        self._lut_gamma = None
+        self._lut = None
+
+    def lut(self):
+        """
+        Returns the cached lookup table.
+        :return: lookup table of 256 elements
+        """
+        gamma = _value(self.gamma)
+        if gamma != self._lut_gamma:
+            inverse = 1.0 / max(gamma, 1e-6)
+            table = (np.arange(256) / 255.0) ** inverse * 255.0
+            self._lut = np.clip(np.rint(table), 0, 255).astype(np.uint8)
+            self._lut_gamma = gamma
+        return self._lut
+
+    def process(self, img):
+        dst = self.output_buffer(img.shape, np.uint8, img)
+        return cv2.LUT(img, self.lut(), dst=dst)
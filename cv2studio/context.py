@@ -0,0 +1,188 @@
+"""
+    This module contains the frame context of
+    the cv2studio framework. It is used to share
+    views derived from a frame between components.
+"""
+
+import cv2
+import numpy as np
+
+
+__all__ = [
+    'FrameContext'
+]
+
+
+class FrameContext:
+    """
+    Holds the current frame and lazily computes
+    views derived from it. Every view is computed
+    at most once per frame and the cache is cleared
+    when the next frame comes.
+
+    All views are derived from <frame>, i.e. the
+    image after App.pre_process, not from the image
+    a component receives from the previous one.
+
+    Views are read-only, since they are shared.
+    A component that hands back the frame may have
+    drawn on it, so all the views are invalidated then.
+    """
+
+    def __init__(self, frame=None):
+        self.frame = None
+        self.index = -1
+        self._views = {}
+        self.advance(frame)
+
+    def advance(self, frame):
+        """
+        Sets the next frame and
+        invalidates all the views.
+        :param frame: new frame
+        :return: None
+        """
+        self.frame = frame
+        self.index += 1
+        self._views.clear()
+
+    def release(self, img):
+        """
+        Called with the output of every component.
+        Invalidates all the views if it is the frame.
+        :param img: output of a component
+        :return: None
+        """
+        if self.is_frame(img):
+            self._views.clear()
+
+    def view(self, key, compute):
+        """
+        Returns a view of the frame computing it
+        on the first request within the frame.
+        :param key: hashable name of the view
+        :param compute: function of the frame to compute the view
+        :return: the view
+        """
+        try:
+            return self._views[key]
+        except KeyError:
+            value = compute(self.frame)
+            for array in _arrays(value):
+                if array is not self.frame:
+                    array.flags.writeable = False
+            self._views[key] = value
+            return value
+
+    def nbytes(self):
+        """
+        :return: memory used by the cached views
+        """
+        total = 0
+        for value in self._views.values():
+            for array in _arrays(value):
+                if array is not self.frame:
+                    total += array.nbytes
+        return total
+
+    def is_view(self, img):
+        """
+        :param img: image to check
+        :return: True if the image is one of the cached views
+        """
+        return any(array is img for value in self._views.values()
+                   for array in _arrays(value))
+
+    def is_frame(self, img):
+        """
+        :param img: image to check
+        :return: True if the image is the frame itself
+        """
+        return img is self.frame and img is not None
+
+    def gray(self):
+        """
+        :return: grayscale version of the frame
+        """
+        code = _GRAY_CODES[_channels(self.frame)]
+        return self.frame if code is None else self.cvt_color(code)
+
+    def bgr(self):
+        """
+        :return: BGR version of the frame
+        """
+        code = _BGR_CODES[_channels(self.frame)]
+        return self.frame if code is None else self.cvt_color(code)
+
+    def cvt_color(self, code):
+        """
+        :param code: OpenCV color conversion code
+        :return: the frame converted with the code
+        """
+        return self.view(('cvt_color', code), lambda frame: cv2.cvtColor(frame, code))
+
+    def hsv(self):
+        """
+        :return: HSV version of the frame
+        """
+        if _channels(self.frame) == 3:
+            return self.cvt_color(cv2.COLOR_BGR2HSV)
+        return self.view('hsv', lambda frame: cv2.cvtColor(self.bgr(), cv2.COLOR_BGR2HSV))
+
+    def pyramid(self, level):
+        """
+        Level 0 is the frame itself, every next level
+        is computed from the previous one with pyrDown.
+        :param level: level of the Gaussian pyramid
+        :return: the pyramid level
+        """
+        if level <= 0:
+            return self.frame
+        return self.view(('pyramid', level),
+                         lambda frame: cv2.pyrDown(self.pyramid(level - 1)))
+
+    def resized(self, width, height, interpolation=cv2.INTER_LINEAR):
+        """
+        :param width: width of the view
+        :param height: height of the view
+        :param interpolation: OpenCV interpolation method
+        :return: the frame resized to the given size
+        """
+        return self.view(('resized', width, height, interpolation),
+                         lambda frame: cv2.resize(frame, (width, height),
+                                                  interpolation=interpolation))
+
+    def integral(self):
+        """
+        :return: integral image of the grayscale frame
+        """
+        return self.view('integral', lambda frame: cv2.integral(self.gray()))
+
+    def gradients(self, ksize=3):
+        """
+        :param ksize: size of the Sobel kernel
+        :return: x and y derivatives of the grayscale frame
+        """
+        return self.view(('gradients', ksize), lambda frame: (
+            cv2.Sobel(self.gray(), cv2.CV_32F, 1, 0, ksize=ksize),
+            cv2.Sobel(self.gray(), cv2.CV_32F, 0, 1, ksize=ksize)
+        ))
+
+
+# codes converting GRAY, BGR and
+# BGRA frames to GRAY and to BGR
+_GRAY_CODES = {1: None, 3: cv2.COLOR_BGR2GRAY, 4: cv2.COLOR_BGRA2GRAY}
+_BGR_CODES = {1: cv2.COLOR_GRAY2BGR, 3: None, 4: cv2.COLOR_BGRA2BGR}
+
+
+def _channels(frame):
+    return frame.shape[2] if len(frame.shape) == 3 else 1
+
+
+def _arrays(value):
+    """
+    :param value: cached view
+    :return: arrays the view consists of
+    """
+    values = value if isinstance(value, tuple) else (value,)
+    return [array for array in values if isinstance(array, np.ndarray)]
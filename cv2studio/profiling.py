@@ -0,0 +1,297 @@
+"""
+    This module contains memory instrumentation
+    of the cv2studio framework.
+"""
+
+import json
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+
+__all__ = [
+    'MemoryProfiler'
+]
+
+# peak of traced memory can be reset
+# only since python 3.9, before that
+# allocations per frame are not recorded
+PEAK_AVAILABLE = hasattr(tracemalloc, 'reset_peak')
+
+
+def _owned_arrays(obj, depth=3, visited=None):
+    """
+    Collects numpy arrays reachable from
+    attributes of the object.
+    :param obj: object to inspect
+    :param depth: how deep containers are inspected
+    :param visited: ids of already inspected objects
+    :return: list of found arrays
+    """
+    if visited is None:
+        visited = set()
+    if id(obj) in visited:
+        return []
+    visited.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return [obj]
+    if depth == 0:
+        return []
+
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        children = obj
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        children = vars(obj).values()
+    else:
+        return []
+
+    arrays = []
+    for child in list(children):
+        arrays.extend(_owned_arrays(child, depth - 1, visited))
+    return arrays
+
+
+def _nbytes(arrays):
+    """
+    Calculates memory used by the arrays.
+    Views of the same memory are counted once.
+    :param arrays: list of arrays
+    :return: number of bytes
+    """
+    total = 0
+    counted = set()
+    for array in arrays:
+        base = array
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if id(base) not in counted:
+            counted.add(id(base))
+            total += base.nbytes
+    return total
+
+
+class ComponentMemory:
+    """
+    Memory statistics of one component.
+    Allocated and peak memory are None if
+    they can't be measured (python < 3.9).
+    """
+
+    def __init__(self, name, window_size):
+        self.name = name
+        self.frames = 0
+        self.peak = 0 if PEAK_AVAILABLE else None
+        self.output_shape = None
+        self.output_dtype = None
+        self.output_nbytes = 0
+
+        # allocated and retained memory
+        # of the last <window_size> frames
+        self.allocated_history = deque(maxlen=window_size)
+        self.retained_history = deque(maxlen=window_size)
+        self.owned_history = deque(maxlen=window_size)
+
+    def allocated(self):
+        """
+        Memory allocated per frame averaged
+        over the window of frames.
+        :return: number of bytes or None if it isn't measured
+        """
+        if not PEAK_AVAILABLE:
+            return None
+        if not self.allocated_history:
+            return 0
+        return sum(self.allocated_history) // len(self.allocated_history)
+
+    def growth(self):
+        """
+        Memory retained by the component
+        over the window of frames.
+        :return: number of bytes
+        """
+        if len(self.owned_history) < 2:
+            return 0
+        owned_growth = self.owned_history[-1] - self.owned_history[0]
+
+        # the first frame of the window is
+        # excluded since its allocations happened
+        # before the window has started
+        traced_growth = sum(list(self.retained_history)[1:])
+        return max(owned_growth, traced_growth)
+
+    def to_dict(self, threshold):
+        return {
+            'frames': self.frames,
+            'allocated_per_frame': self.allocated(),
+            'peak': self.peak,
+            'output_shape': self.output_shape,
+            'output_dtype': self.output_dtype,
+            'output_nbytes': self.output_nbytes,
+            'owned_nbytes': self.owned_history[-1] if self.owned_history else 0,
+            'growth': self.growth(),
+            'leaking': self.is_leaking(threshold)
+        }
+
+    def is_leaking(self, threshold):
+        """
+        Component is considered leaking if the window
+        is full and memory has grown over the threshold.
+        :param threshold: number of bytes
+        :return: True if component is leaking
+        """
+        full = len(self.retained_history) == self.retained_history.maxlen
+        return full and self.growth() > threshold
+
+
+class MemoryProfiler:
+    """
+    Records memory used by components per frame.
+    It traces allocations with tracemalloc and
+    accounts numpy arrays owned by components.
+
+    A component is flagged as leaking if memory
+    it retains grows more than <threshold> bytes
+    over the last <window_size> frames.
+    """
+
+    def __init__(self, window_size=100, threshold=1 << 20):
+        """
+        :param window_size: number of frames to detect growth over
+        :param threshold: growth in bytes to flag a component
+        """
+        self.window_size = window_size
+        self.threshold = threshold
+        self.components = {}
+        self.frames = 0
+        self.traced_peak = 0
+        self._started_tracing = False
+
+    def start(self):
+        """
+        Starts tracing of allocations.
+        :return: None
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stops tracing of allocations if
+        it was started by the profiler.
+        :return: None
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def next_frame(self):
+        """
+        Marks the beginning of a new frame.
+        :return: None
+        """
+        self.frames += 1
+
+    def profile(self, name, component, img, context=None):
+        """
+        Calls the component and records
+        memory it has used.
+        :param name: name of the component in the report
+        :param component: component to call
+        :param img: image to process
+        :param context: frame context passed to the component
+        :return: processed image
+        """
+        self.start()
+        stats = self.components.get(name)
+        if stats is None:
+            stats = ComponentMemory(name, self.window_size)
+            self.components[name] = stats
+
+        if PEAK_AVAILABLE:
+            tracemalloc.reset_peak()
+        views_before = context.nbytes() if context is not None else 0
+        before, _ = tracemalloc.get_traced_memory()
+        result = component(img) if context is None else component(img, context)
+        after, peak = tracemalloc.get_traced_memory()
+        self.traced_peak = max(self.traced_peak, peak)
+        views_after = context.nbytes() if context is not None else 0
+
+        # views of the frame context
+        # are not owned by the component
+        owned = _owned_arrays(component, visited={id(context)})
+        output_is_new = isinstance(result, np.ndarray) \
+            and not np.may_share_memory(result, img) \
+            and not any(array is result for array in owned) \
+            and not (context is not None and context.is_view(result))
+
+        stats.frames += 1
+        if PEAK_AVAILABLE:
+            allocated = max(peak - before, 0)
+            stats.allocated_history.append(allocated)
+            stats.peak = max(stats.peak, allocated)
+        if isinstance(result, np.ndarray):
+            stats.output_shape = list(result.shape)
+            stats.output_dtype = str(result.dtype)
+            stats.output_nbytes = result.nbytes
+
+        # newly allocated output is handed to the
+        # next component, so it isn't retained
+        # views cached in the frame context are
+        # released when the next frame comes
+        retained = after - before - (views_after - views_before)
+        if output_is_new:
+            retained -= result.nbytes
+        stats.retained_history.append(retained)
+        stats.owned_history.append(_nbytes(owned))
+        return result
+
+    def leaking(self):
+        """
+        :return: names of components flagged as leaking
+        """
+        return [name for name, stats in self.components.items()
+                if stats.is_leaking(self.threshold)]
+
+    def report(self):
+        """
+        :return: dictionary with memory statistics
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'frames': self.frames,
+            'traced_current': current,
+            'traced_peak': max(self.traced_peak, peak),
+            'components': {name: stats.to_dict(self.threshold)
+                           for name, stats in self.components.items()},
+            'leaking': self.leaking()
+        }
+
+    def dump_json(self, path):
+        """
+        Saves the report to a JSON file.
+        :param path: path to the file
+        :return: None
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def to_log_window(self, log_window):
+        """
+        Writes the report into a log window.
+        :param log_window: LogWindow to write to
+        :return: None
+        """
+        for name, stats in self.components.items():
+            if PEAK_AVAILABLE:
+                allocated = '{0} KiB/frame, peak {1} KiB, '.format(
+                    stats.allocated() // 1024, stats.peak // 1024)
+            else:
+                allocated = ''
+            log_window[name] = '{0}growth {1} KiB{2}'.format(
+                allocated, stats.growth() // 1024,
+                ' LEAK' if stats.is_leaking(self.threshold) else '')
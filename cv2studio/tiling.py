@@ -0,0 +1,292 @@
+"""
+    This module contains tiled processing of
+    very large images for the cv2studio framework.
+
+    The source is a .npy file, it is memory-mapped
+    and read tile by tile. Every tile is
+    processed by the chain of components with an
+    overlap (halo) around it and the results are
+    stitched into a memory-mapped output. So memory
+    used is bounded by the tile size, not the image size.
+"""
+
+import copy
+import os
+import pickle
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from .context import FrameContext
+from .gui import TrackBar
+
+
+__all__ = [
+    'TiledProcessor',
+    'open_image'
+]
+
+
+def open_image(path: str):
+    '''
+    Opens an image for tiled processing.
+    Only numpy files (.npy) are supported, since they
+    can be memory-mapped. Other formats would be
+    decoded as a whole by cv2.imread, so they must be
+    converted to .npy first (for example, written tile
+    by tile into np.lib.format.open_memmap with a reader
+    that supports tiles, like tifffile or GDAL).
+    :param path: path to the image
+    :return: memory-mapped image or None if it can't be loaded
+    '''
+    if path is None:
+        return None
+    if not path.endswith('.npy'):
+        raise ValueError('tiled processing requires a .npy image, '
+                         'convert {} to .npy first'.format(path))
+    if not os.path.isfile(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+def resolve_track_bars(components):
+    '''
+    Replaces track bars in parameters of components
+    with their current values. Track bars are read
+    here, on the calling thread, since HighGUI is not
+    thread-safe. Not displayed track bars have their
+    start values.
+    :param components: components to resolve
+    :return: list of components without track bars
+    '''
+    resolved = []
+    for component in components:
+        tracks = {name: attr for name, attr in component.__dict__.items()
+                  if isinstance(attr, TrackBar)}
+        if tracks:
+            component = copy.copy(component)
+            for name, track in tracks.items():
+                value = track.get_value() if track.displayed else track.start_value
+                setattr(component, name, value)
+        resolved.append(component)
+    return resolved
+
+
+def tiles(shape, tile_size):
+    '''
+    Splits an image into tiles.
+    :param shape: shape of the image
+    :param tile_size: size of a tile side
+    :return: list of (y0, y1, x0, x1) of tiles
+    '''
+    height, width = shape[:2]
+    return [(y, min(y + tile_size, height), x, min(x + tile_size, width))
+            for y in range(0, height, tile_size)
+            for x in range(0, width, tile_size)]
+
+
+def process_tile(source, tile, halo, components, pre_process=None, post_process=None):
+    '''
+    Processes one tile of the source with the halo
+    around it and crops the halo from the result.
+    :param source: source image
+    :param tile: (y0, y1, x0, x1) of the tile
+    :param halo: overlap with neighbouring tiles
+    :param components: components to apply
+    :param pre_process: function called before components
+    :param post_process: function called after components
+    :return: processed tile
+    '''
+    y0, y1, x0, x1 = tile
+    height, width = source.shape[:2]
+    top, left = max(y0 - halo, 0), max(x0 - halo, 0)
+    bottom, right = min(y1 + halo, height), min(x1 + halo, width)
+
+    img = np.ascontiguousarray(source[top:bottom, left:right])
+    if pre_process is not None:
+        img = pre_process(img)
+    context = FrameContext(img)
+    for component in components:
+        img = component(img, context)
+    if post_process is not None:
+        img = post_process(img)
+
+    if img.shape[:2] != (bottom - top, right - left):
+        raise ValueError('components must keep the size of the image in tiled mode')
+    return img[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+def _remove(path):
+    '''
+    Removes a temporary file if it still exists.
+    :param path: path to the file
+    :return: None
+    '''
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# state of a worker process, the
+# key is (source path, output path)
+_worker = {}
+
+
+def _process_tile_in_worker(source_path, output_path, halo, components, tile):
+    # the state is created by the first task
+    # of a run in the process, since executors
+    # have no initializer before python 3.7
+    key = (source_path, output_path)
+    if key not in _worker:
+        _worker.clear()
+        _worker[key] = (np.load(source_path, mmap_mode='r'),
+                        np.load(output_path, mmap_mode='r+'),
+                        pickle.loads(components))
+    source, output, components = _worker[key]
+
+    y0, y1, x0, x1 = tile
+    output[y0:y1, x0:x1] = process_tile(source, tile, halo, components)
+
+
+class TiledProcessor:
+    """
+    Applies components to a large image tile by
+    tile in a pool of threads or processes.
+
+    Components must keep the size of the image and
+    their neighbourhood must not exceed <halo> pixels,
+    then the result is the same as for the whole image.
+
+    Track bars in parameters of components are read
+    once before processing (see resolve_track_bars).
+
+    With threads the components are shared between
+    workers, so they must be thread-safe. Built-in
+    components are, user components must not change
+    their state in process (the frame context is kept
+    per thread). With processes the components are
+    pickled into every worker, pre_process and
+    post_process aren't supported and an in-memory
+    source is copied into a temporary .npy file.
+    """
+
+    def __init__(self, components, tile_size=1024, halo=16, workers=None,
+                 processes=False, pre_process=None, post_process=None):
+        '''
+        :param components: components to apply
+        :param tile_size: size of a tile side
+        :param halo: overlap with neighbouring tiles
+        :param workers: number of workers (number of CPUs by default)
+        :param processes: if True, processes are used instead of threads
+        :param pre_process: function called for each tile before components
+        :param post_process: function called for each tile after components
+        '''
+        if processes and (pre_process is not None or post_process is not None):
+            raise ValueError('pre_process and post_process are not supported with processes')
+        self.components = list(components)
+        self.tile_size = tile_size
+        self.halo = halo
+        self.workers = workers or os.cpu_count() or 1
+        self.processes = processes
+        self.pre_process = pre_process
+        self.post_process = post_process
+
+    def run(self, source, output_path=None):
+        '''
+        Processes the source image.
+        :param source: image, memory-mapped image or path to a .npy file
+        :param output_path: path to the output .npy file. By default
+            a temporary file is used, it is removed when the result
+            (and all views of it) is garbage collected
+        :return: memory-mapped result
+        '''
+        if isinstance(source, str):
+            path = source
+            source = open_image(path)
+            if source is None:
+                raise AttributeError('failed to load a resource {}'.format(path))
+        temporary = output_path is None
+        if temporary:
+            fd, output_path = tempfile.mkstemp(suffix='.npy')
+            os.close(fd)
+
+        components = resolve_track_bars(self.components)
+        try:
+            # the first tile defines
+            # type and channels of the output
+            grid = tiles(source.shape, self.tile_size)
+            first = process_tile(source, grid[0], self.halo, components,
+                                 self.pre_process, self.post_process)
+            output = np.lib.format.open_memmap(
+                output_path, mode='w+', dtype=first.dtype,
+                shape=source.shape[:2] + first.shape[2:])
+            if temporary:
+                weakref.finalize(output, _remove, output_path)
+            y0, y1, x0, x1 = grid[0]
+            output[y0:y1, x0:x1] = first
+
+            if self.processes:
+                self._run_processes(source, output, grid[1:], components)
+            else:
+                self._run_threads(source, output, grid[1:], components)
+        except Exception:
+            if temporary:
+                _remove(output_path)
+            raise
+        output.flush()
+        return output
+
+    def _run_threads(self, source, output, grid, components):
+        def run_tile(tile):
+            y0, y1, x0, x1 = tile
+            output[y0:y1, x0:x1] = process_tile(
+                source, tile, self.halo, components,
+                self.pre_process, self.post_process)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            for future in [executor.submit(run_tile, tile) for tile in grid]:
+                future.result()
+
+    def _run_processes(self, source, output, grid, components):
+        output.flush()
+        source_path, temporary = self._source_path(source)
+
+        # components are pickled once and
+        # unpickled once in every worker
+        components = pickle.dumps(components)
+        try:
+            with ProcessPoolExecutor(self.workers) as executor:
+                futures = [executor.submit(_process_tile_in_worker, source_path, output.filename,
+                                           self.halo, components, tile)
+                           for tile in grid]
+                for future in futures:
+                    future.result()
+        finally:
+            if temporary:
+                _remove(source_path)
+
+    def _source_path(self, source):
+        '''
+        Finds a .npy file workers can map the source from.
+        The source is copied into a temporary file
+        tile by tile if there is no such file.
+        :param source: source image
+        :return: path to the file and True if the file is temporary
+        '''
+        filename = getattr(source, 'filename', None)
+        if isinstance(source, np.memmap) and filename and filename.endswith('.npy'):
+            mapped = np.load(filename, mmap_mode='r')
+            if mapped.shape == source.shape and mapped.dtype == source.dtype:
+                return filename, False
+
+        fd, path = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        mapped = np.lib.format.open_memmap(path, mode='w+', dtype=source.dtype, shape=source.shape)
+        for y0, y1, x0, x1 in tiles(source.shape, self.tile_size):
+            mapped[y0:y1, x0:x1] = source[y0:y1, x0:x1]
+        mapped.flush()
+        del mapped
+        return path, True
@@ -0,0 +1,111 @@
+import sys
+import os
+import copy
+import numpy as np
+import cv2
+
+
+def import_cv2studio():
+    """
+    Imports cv2stuido module.
+    Returns:
+        module -- cv2studio module
+    """
+    root_dir = os.path.sep.join(__file__.split(os.path.sep)[:-2])
+    sys.path.insert(0, root_dir)
+    import cv2studio
+    import cv2studio.components
+    return cv2studio
+
+
+cv2studio = import_cv2studio()
+components = cv2studio.components
+
+img = np.random.RandomState(0).randint(0, 256, (48, 64, 3)).astype(np.uint8)
+
+
+class TestInputFormat:
+    def test_declared_format(self):
+        class GrayOnly(cv2studio.Component):
+            input_format = cv2studio.GRAY
+
+            def process(self, img):
+                assert len(img.shape) == 2
+                return img
+
+        assert GrayOnly()(img).shape == img.shape[:2]
+
+    def test_bgra_to_bgr(self):
+        bgra = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+        assert cv2studio.convert_format(bgra, cv2studio.BGR).shape == img.shape
+        context = cv2studio.FrameContext(bgra)
+        assert cv2studio.convert_format(bgra, cv2studio.BGR, context).shape == img.shape
+
+    def test_convert_format(self):
+        gray = cv2studio.convert_format(img, cv2studio.GRAY)
+        assert cv2studio.convert_format(gray, cv2studio.GRAY) is gray
+        assert cv2studio.convert_format(gray, cv2studio.BGR).shape == img.shape
+
+
+class TestComponents:
+    def test_buffered_subclass_without_init(self):
+        class Invert(components.BufferedComponent):
+            def __init__(self):
+                pass
+
+            def process(self, img):
+                return cv2.bitwise_not(img, dst=self.output_buffer(img.shape, img.dtype, img))
+
+        invert = Invert()
+        result = invert(img)
+        assert np.array_equal(result, 255 - img)
+        assert invert(img) is result
+        assert copy.deepcopy(invert)._buffer is None
+        assert copy.deepcopy(Invert())._buffer is None
+
+    def test_gaussian_blur(self):
+        blur = components.GaussianBlur(5)
+        result = blur(img)
+        assert np.array_equal(result, cv2.GaussianBlur(img, (5, 5), 0))
+        assert blur(img) is result
+
+    def test_threshold(self):
+        threshold = components.Threshold(100)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        expected = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
+        assert np.array_equal(threshold(img), expected)
+
+    def test_color_conversion_skipped(self):
+        conversion = components.ColorConversion(cv2.COLOR_BGR2GRAY)
+        gray = conversion(img)
+        assert gray.shape == img.shape[:2]
+        assert conversion(gray) is gray
+
+    def test_color_conversion_without_retry(self):
+        class Conversion(components.ColorConversion):
+            calls = 0
+
+            def process(self, img):
+                self.calls += 1
+                return components.ColorConversion.process(self, img)
+
+        conversion = Conversion(cv2.COLOR_BGR2HSV)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        expected = cv2.cvtColor(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), cv2.COLOR_BGR2HSV)
+        assert np.array_equal(conversion(gray), expected)
+        assert conversion.calls == 1
+
+    def test_morphology_kernel_cached(self):
+        morphology = components.Morphology(cv2.MORPH_DILATE, 5)
+        kernel = morphology.kernel()
+        morphology(img)
+        assert morphology.kernel() is kernel
+        morphology.ksize = 3
+        assert morphology.kernel().shape == (3, 3)
+
+    def test_resize(self):
+        assert components.Resize(width=32)(img).shape == (24, 32, 3)
+        assert components.Resize(scale=1)(img) is img
+
+    def test_gamma_correction(self):
+        assert np.array_equal(components.GammaCorrection(1.0)(img), img)
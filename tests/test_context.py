@@ -0,0 +1,116 @@
+import sys
+import os
+import numpy as np
+import cv2
+
+
+def import_cv2studio():
+    """
+    Imports cv2stuido module.
+    Returns:
+        module -- cv2studio module
+    """
+    root_dir = os.path.sep.join(__file__.split(os.path.sep)[:-2])
+    sys.path.insert(0, root_dir)
+    import cv2studio
+    import cv2studio.components
+    return cv2studio
+
+
+cv2studio = import_cv2studio()
+components = cv2studio.components
+
+img = np.random.RandomState(0).randint(0, 256, (64, 64, 3)).astype(np.uint8)
+
+
+class TestFrameContext:
+    def test_views_are_memoized(self):
+        context = cv2studio.FrameContext(img)
+        gray = context.gray()
+        assert np.array_equal(gray, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        assert context.gray() is gray
+        assert context.pyramid(2).shape == (16, 16, 3)
+        assert context.pyramid(1) is context.pyramid(1)
+        assert context.integral().shape == (65, 65)
+
+    def test_advance_invalidates(self):
+        context = cv2studio.FrameContext(img)
+        hsv = context.hsv()
+        context.advance(img.copy())
+        assert context.hsv() is not hsv
+        assert context.index == 1
+
+    def test_bgra_frame(self):
+        context = cv2studio.FrameContext(cv2.cvtColor(img, cv2.COLOR_BGR2BGRA))
+        assert np.array_equal(context.hsv(), cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+
+    def test_frame_drawn_in_place(self):
+        class UsesGray(cv2studio.Component):
+            def process(self, img):
+                self.frame_context.gray()
+                return img
+
+        class Draw(cv2studio.Component):
+            def process(self, img):
+                cv2.rectangle(img, (0, 0), (31, 31), (255, 255, 255), -1)
+                return img
+
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        context = cv2studio.FrameContext(frame)
+        result = frame
+        for component in [UsesGray(), Draw(), components.Threshold(127)]:
+            result = component(result, context)
+        assert np.count_nonzero(result) == 32 * 32
+
+    def test_builtins_share_views(self):
+        context = cv2studio.FrameContext(img)
+        hsv = context.cvt_color(cv2.COLOR_BGR2HSV)
+        assert components.ColorConversion(cv2.COLOR_BGR2HSV)(img, context) is hsv
+        small = context.resized(32, 32)
+        assert components.Resize(32, 32)(img, context) is small
+
+    def test_one_key_per_conversion(self):
+        context = cv2studio.FrameContext(img)
+        assert context.hsv() is context.cvt_color(cv2.COLOR_BGR2HSV)
+        assert context.gray() is context.cvt_color(cv2.COLOR_BGR2GRAY)
+        assert context.bgr() is img
+
+    def test_views_are_read_only(self):
+        context = cv2studio.FrameContext(img)
+        assert not context.gray().flags.writeable
+        assert not any(array.flags.writeable for array in context.gradients())
+        assert img.flags.writeable
+
+    def test_view_shared_after_component(self):
+        context = cv2studio.FrameContext(img)
+        hsv = components.ColorConversion(cv2.COLOR_BGR2HSV)(img, context)
+        assert context.cvt_color(cv2.COLOR_BGR2HSV) is hsv
+        components.Threshold(127)(img, context)
+        gray = context.gray()
+        assert components.ColorConversion(cv2.COLOR_BGR2GRAY)(img, context) is gray
+
+    def test_own_context_attribute(self):
+        class Scale(cv2studio.Component):
+            def __init__(self):
+                self.context = {'scale': 2}
+
+            def process(self, img):
+                return img * self.context['scale']
+
+        component = Scale()
+        component(img, cv2studio.FrameContext(img))
+        assert component(img).shape == img.shape
+        assert component.context == {'scale': 2}
+
+    def test_component_receives_context(self):
+        class GrayOnly(cv2studio.Component):
+            input_format = cv2studio.GRAY
+
+            def process(self, img):
+                return img
+
+        context = cv2studio.FrameContext(img)
+        component = GrayOnly()
+        gray = context.gray()
+        assert component(img, context) is gray
+        assert component.frame_context is context
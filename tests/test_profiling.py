@@ -0,0 +1,148 @@
+import sys
+import os
+import json
+import tracemalloc
+import numpy as np
+
+
+def import_cv2studio():
+    """
+    Imports cv2stuido module.
+    Returns:
+        module -- cv2studio module
+    """
+    root_dir = os.path.sep.join(__file__.split(os.path.sep)[:-2])
+    sys.path.insert(0, root_dir)
+    import cv2studio
+    return cv2studio
+
+
+cv2studio = import_cv2studio()
+
+img = np.zeros((100, 100), dtype=np.uint8)
+
+
+class Leaky(cv2studio.Component):
+    def __init__(self):
+        self.history = []
+
+    def process(self, img):
+        self.history.append(img.copy())
+        return img
+
+
+class Invert(cv2studio.Component):
+    def process(self, img):
+        return 255 - img
+
+
+def run(profiler, components, frames=30):
+    for _ in range(frames):
+        frame = img
+        profiler.next_frame()
+        for idx, component in enumerate(components):
+            frame = profiler.profile(str(idx), component, frame)
+
+
+class TestMemoryProfiler:
+    def test_leak_detection(self):
+        profiler = cv2studio.MemoryProfiler(window_size=10, threshold=50000)
+        try:
+            run(profiler, [Leaky(), Invert()])
+        finally:
+            profiler.stop()
+        assert profiler.leaking() == ['0']
+
+    def test_report(self, tmpdir):
+        profiler = cv2studio.MemoryProfiler(window_size=10)
+        try:
+            run(profiler, [Invert()], frames=3)
+            path = str(tmpdir.join('memory.json'))
+            profiler.dump_json(path)
+        finally:
+            profiler.stop()
+        with open(path) as f:
+            report = json.load(f)
+        assert report['frames'] == 3
+        assert report['components']['0']['output_shape'] == [100, 100]
+        assert report['components']['0']['output_dtype'] == 'uint8'
+        if cv2studio.profiling.PEAK_AVAILABLE:
+            assert report['components']['0']['allocated_per_frame'] >= 100 * 100
+        else:
+            assert report['components']['0']['allocated_per_frame'] is None
+
+    def test_peak_unavailable(self, monkeypatch):
+        monkeypatch.setattr(cv2studio.profiling, 'PEAK_AVAILABLE', False)
+        profiler = cv2studio.MemoryProfiler(window_size=10)
+        try:
+            run(profiler, [Invert()], frames=3)
+            report = profiler.report()
+        finally:
+            profiler.stop()
+        assert report['components']['0']['allocated_per_frame'] is None
+        assert report['components']['0']['peak'] is None
+
+
+class FakeCapture:
+    def __init__(self, frames):
+        self.frames = frames
+        self.released = False
+
+    def read(self):
+        if self.frames == 0:
+            return False, None
+        self.frames -= 1
+        return True, np.zeros((100, 100, 3), dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+
+class UsesGray(cv2studio.Component):
+    def process(self, img):
+        self.frame_context.gray()
+        return img
+
+
+def webcam_app(monkeypatch, frames):
+    capture = FakeCapture(frames)
+    monkeypatch.setattr(cv2studio.cv2, 'VideoCapture', lambda *args: capture)
+    app = cv2studio.App()
+    for component in [UsesGray(), Invert(), Leaky()]:
+        app.add_component(component)
+    return app, capture
+
+
+class TestAppMemoryProfiling:
+    def test_update(self, monkeypatch):
+        app, _ = webcam_app(monkeypatch, 20)
+        profiler = app.enable_memory_profiling(window_size=10, threshold=50000, log_window=True)
+        try:
+            while app.update():
+                pass
+            profiler.to_log_window(app.memory_window)
+            report = profiler.report()
+        finally:
+            profiler.stop()
+
+        assert report['frames'] == 20
+        assert sorted(report['components']) == ['0:UsesGray', '1:Invert', '2:Leaky']
+        assert report['components']['1:Invert']['output_shape'] == [100, 100, 3]
+
+        # cached views of the frame are
+        # not counted as retained memory
+        assert report['leaking'] == ['2:Leaky']
+        assert app.memory_window['2:Leaky'].endswith('LEAK')
+
+    def test_main_loop_stops_tracing(self, monkeypatch):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        app, capture = webcam_app(monkeypatch, 3)
+        monkeypatch.setattr(app, 'display', lambda: None)
+        monkeypatch.setattr(cv2studio.cv2, 'waitKey', lambda delay: -1)
+        monkeypatch.setattr(cv2studio.cv2, 'destroyAllWindows', lambda: None)
+        app.enable_memory_profiling()
+        app.main_loop()
+        assert capture.released
+        assert not tracemalloc.is_tracing()
+        assert app.memory_profiler.frames == 3
@@ -0,0 +1,117 @@
+import sys
+import os
+import gc
+import threading
+import numpy as np
+import pytest
+import cv2
+
+
+def import_cv2studio():
+    """
+    Imports cv2stuido module.
+    Returns:
+        module -- cv2studio module
+    """
+    root_dir = os.path.sep.join(__file__.split(os.path.sep)[:-2])
+    sys.path.insert(0, root_dir)
+    import cv2studio
+    import cv2studio.components
+    return cv2studio
+
+
+cv2studio = import_cv2studio()
+components = cv2studio.components
+
+img = np.random.RandomState(0).randint(0, 256, (300, 410, 3)).astype(np.uint8)
+
+
+def chain():
+    return [
+        components.GaussianBlur(7),
+        components.Threshold(120),
+        components.Morphology(cv2.MORPH_OPEN, 5)
+    ]
+
+
+def expected():
+    result = img
+    for component in chain():
+        result = component(result)
+    return result
+
+
+class TestTiledProcessor:
+    def test_threads(self, tmpdir):
+        processor = cv2studio.TiledProcessor(chain(), tile_size=64, halo=8, workers=4)
+        result = processor.run(img, str(tmpdir.join('out.npy')))
+        assert isinstance(result, np.memmap)
+        assert np.array_equal(result, expected())
+
+    def test_processes(self, tmpdir):
+        source = str(tmpdir.join('source.npy'))
+        np.save(source, img)
+        processor = cv2studio.TiledProcessor(chain(), tile_size=128, halo=8, workers=2, processes=True)
+        result = processor.run(source, str(tmpdir.join('out.npy')))
+        assert np.array_equal(result, expected())
+
+    def test_context_in_threads(self, tmpdir):
+        class FrameGray(cv2studio.Component):
+            def process(self, img):
+                return self.frame_context.gray().copy()
+
+        source = np.random.RandomState(1).randint(0, 256, (512, 512, 3)).astype(np.uint8)
+        processor = cv2studio.TiledProcessor([FrameGray()], tile_size=64, halo=0, workers=8)
+        result = processor.run(source, str(tmpdir.join('out.npy')))
+        assert np.array_equal(result, cv2.cvtColor(source, cv2.COLOR_BGR2GRAY))
+
+    def test_temporary_output_removed(self):
+        result = cv2studio.TiledProcessor(chain(), tile_size=128).run(img)
+        path = result.filename
+        assert os.path.isfile(path)
+        del result
+        gc.collect()
+        assert not os.path.exists(path)
+
+    def test_only_npy_sources(self, tmpdir):
+        path = str(tmpdir.join('source.png'))
+        cv2.imwrite(path, img)
+        with pytest.raises(ValueError):
+            cv2studio.TiledProcessor(chain()).run(path)
+        with pytest.raises(ValueError):
+            cv2studio.App(path, cv2studio.TILED_IMAGE)
+
+    def test_track_bars_read_on_main_thread(self, monkeypatch, tmpdir):
+        threads = []
+
+        def get_trackbar_pos(name, window_name):
+            threads.append(threading.current_thread())
+            return 7
+
+        gui = cv2studio.gui
+        monkeypatch.setattr(gui.cv2, 'namedWindow', lambda *args: None)
+        monkeypatch.setattr(gui.cv2, 'createTrackbar', lambda *args: None)
+        monkeypatch.setattr(gui.cv2, 'setTrackbarMin', lambda *args: None)
+        monkeypatch.setattr(gui.cv2, 'getTrackbarPos', get_trackbar_pos)
+
+        blur = components.GaussianBlur(cv2studio.TrackBar('Tiled ksize', 1, 31, 3))
+        processor = cv2studio.TiledProcessor([blur], tile_size=64, halo=8, workers=4)
+        result = processor.run(img, str(tmpdir.join('out.npy')))
+        assert np.array_equal(result, cv2.GaussianBlur(img, (7, 7), 0))
+        assert threads == [threading.main_thread()]
+        assert isinstance(blur.ksize, cv2studio.TrackBar)
+
+    def test_size_must_be_kept(self, tmpdir):
+        processor = cv2studio.TiledProcessor([components.Resize(scale=0.5)], tile_size=64)
+        with pytest.raises(ValueError):
+            processor.run(img, str(tmpdir.join('out.npy')))
+
+    def test_app(self, tmpdir):
+        source = str(tmpdir.join('source.npy'))
+        np.save(source, img)
+        app = cv2studio.App(source, cv2studio.TILED_IMAGE,
+                            tiling={'tile_size': 100, 'output_path': str(tmpdir.join('out.npy'))})
+        for component in chain():
+            app.add_component(component)
+        assert app.update() is False
+        assert np.array_equal(app.img, expected())